@@ -15,6 +15,7 @@ from functools import wraps
 # Third-party imports
 try:
     from flask import Flask, request, jsonify, send_from_directory, render_template_string
+    from markupsafe import escape
     from flask_cors import CORS
     from werkzeug.security import generate_password_hash, check_password_hash
     from werkzeug.utils import secure_filename
@@ -24,24 +25,36 @@ except ImportError as e:
     print("pip install flask flask-cors werkzeug pyjwt")
     sys.exit(1)
 
+from config import Config
+from auth import AuthManager
+from tenants import TenantRegistry, TenantManager, TenantMiddleware, TENANT_ENVIRON_KEY
+
 # Create Flask app
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-app.config['SECRET_KEY'] = secrets.token_hex(32)
-app.config['DATABASE_PATH'] = os.path.join(BASE_DIR, 'medical_portfolio.db')
+app.config['SECRET_KEY'] = Config.SECRET_KEY
+app.config['DATABASE_PATH'] = Config.DATABASE_PATH
 app.config['UPLOAD_FOLDER'] = os.path.join(BASE_DIR, 'static', 'uploads')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+for key in ('TENANTS_DIR', 'TENANTS_FILE', 'DEFAULT_TENANT', 'TENANT_PATH_PREFIX',
+            'DEFAULT_TENANT_HOSTS', 'TENANT_BASE_DOMAIN', 'TENANT_MAX_OPEN', 'TENANT_POOL_SIZE',
+            'TENANT_STATS_TTL'):
+    app.config[key] = getattr(Config, key)
 
 # Create directories
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 # ==================== SIMPLE DATABASE SETUP ====================
-def init_db():
-    """Initialize the database"""
-    conn = sqlite3.connect(app.config['DATABASE_PATH'])
+# Shared credentials seeded by the original single-practitioner version
+LEGACY_ADMIN_USERNAME = 'admin'
+LEGACY_ADMIN_PASSWORD = 'admin9048'
+_legacy_admin_checked = set()  # db paths already checked in this process
+
+def init_schema(conn, tenant):
+    """Create tables and the tenant's own admin in a tenant database"""
     cursor = conn.cursor()
     
     # Create clients table
@@ -61,23 +74,98 @@ def init_db():
         )
     ''')
     
-    # Create admin user
-    cursor.execute('SELECT COUNT(*) FROM sqlite_master WHERE type="table" AND name="admin_users"')
-    if cursor.fetchone()[0] == 0:
-        cursor.execute('''
-            CREATE TABLE admin_users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL
-            )
-        ''')
-        # Add default admin
-        password_hash = generate_password_hash("admin9048")
-        cursor.execute('INSERT INTO admin_users (username, password_hash) VALUES (?, ?)', 
-                      ('admin', password_hash))
+    # Create admin users table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admin_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+    ''')
+    
+    # Sync the tenant's configured admin; there is no shared default account,
+    # so a tenant without a configured password has no admin login
+    if tenant.admin_password and not tenant.admin_password_hash:
+        # Plain-text password: hash it once per process, keeping the stored
+        # hash if it already matches so reopening the tenant stays cheap
+        cursor.execute('SELECT password_hash FROM admin_users WHERE username = ?', (tenant.admin_username,))
+        row = cursor.fetchone()
+        if row and check_password_hash(row[0], tenant.admin_password):
+            tenant.admin_password_hash = row[0]
+        else:
+            tenant.admin_password_hash = generate_password_hash(tenant.admin_password)
     
-    conn.commit()
-    conn.close()
+    if tenant.admin_password_hash:
+        cursor.execute('INSERT OR IGNORE INTO admin_users (username, password_hash) VALUES (?, ?)',
+                      (tenant.admin_username, tenant.admin_password_hash))
+        cursor.execute('UPDATE admin_users SET password_hash = ? WHERE username = ? AND password_hash != ?',
+                      (tenant.admin_password_hash, tenant.admin_username, tenant.admin_password_hash))
+    
+    # Databases created before multi-tenancy carry the old shared default
+    # admin; disable it unless it was just given a configured password
+    if (tenant.db_path not in _legacy_admin_checked
+            and not (tenant.admin_password_hash and tenant.admin_username == LEGACY_ADMIN_USERNAME)):
+        _legacy_admin_checked.add(tenant.db_path)
+        cursor.execute('SELECT password_hash FROM admin_users WHERE username = ?', (LEGACY_ADMIN_USERNAME,))
+        row = cursor.fetchone()
+        if row and check_password_hash(row[0], LEGACY_ADMIN_PASSWORD):
+            cursor.execute('DELETE FROM admin_users WHERE username = ?', (LEGACY_ADMIN_USERNAME,))
+            app.logger.warning('Removed the legacy default admin from portfolio %r; '
+                               'configure an admin password to log in', tenant.slug)
+
+# ==================== TENANTS ====================
+# Each practitioner portfolio is a tenant with its own SQLite database,
+# resolved from the Host header or a '/t/<slug>' path prefix. The original
+# single-practitioner database is kept as the default tenant.
+tenant_registry = TenantRegistry(app.config['TENANTS_DIR'],
+                                 base_domain=app.config['TENANT_BASE_DOMAIN'])
+tenant_registry.add(app.config['DEFAULT_TENANT'], 'Dr. Foscah Faith',
+                    db_path=app.config['DATABASE_PATH'],
+                    hosts=[h.strip() for h in app.config['DEFAULT_TENANT_HOSTS'] if h.strip()],
+                    admin_password=Config.ADMIN_PASSWORD)
+tenant_registry.load(app.config['TENANTS_FILE'])
+
+# Admin tokens must verify in every worker and survive reloads
+if len(tenant_registry) > 1 and not os.environ.get('SECRET_KEY'):
+    app.logger.warning('SECRET_KEY is not set: each worker signs admin tokens with its own '
+                       'random key, so tokens fail on other workers and after a restart')
+
+tenant_manager = TenantManager(max_open=app.config['TENANT_MAX_OPEN'],
+                               pool_size=app.config['TENANT_POOL_SIZE'],
+                               init_schema=init_schema)
+
+app.wsgi_app = TenantMiddleware(app.wsgi_app, tenant_registry,
+                                default_slug=app.config['DEFAULT_TENANT'],
+                                path_prefix=app.config['TENANT_PATH_PREFIX'])
+
+def current_tenant():
+    """Tenant resolved for this request by TenantMiddleware"""
+    return request.environ[TENANT_ENVIRON_KEY]
+
+def tenant_state():
+    """Open pool and caches for the current tenant"""
+    return tenant_manager.get(current_tenant())
+
+auth = AuthManager(app.config['SECRET_KEY'], tenant_getter=lambda: current_tenant().slug)
+
+def fill(html, **values):
+    """Substitute {{name}} placeholders; str.format trips over CSS braces"""
+    for key, value in values.items():
+        html = html.replace('{{' + key + '}}', str(escape(value)))
+    return html
+
+def count_clients(state, cached=True):
+    """Number of client submissions, cached per tenant for TENANT_STATS_TTL"""
+    def query():
+        with state.pool.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM clients').fetchone()[0]
+    if not cached:
+        return query()
+    return state.cache.get_or_set('stats', 'clients', query, ttl=app.config['TENANT_STATS_TTL'])
+
+def init_db():
+    """Initialize the default tenant's database"""
+    tenant_manager.get(tenant_registry.get(app.config['DEFAULT_TENANT']))
 
 # ==================== SIMPLE ROUTES ====================
 @app.route('/')
@@ -87,7 +175,7 @@ def index():
     <!DOCTYPE html>
     <html>
     <head>
-        <title>Medical Portfolio | Dr. Foscah Faith</title>
+        <title>Medical Portfolio | {{practitioner}}</title>
         <style>
             body {
                 font-family: Arial, sans-serif;
@@ -139,19 +227,20 @@ def index():
             <div class="status">
                 ✅ System is running successfully!
             </div>
-            <p>Welcome to the Medical Portfolio System for Dr. Foscah Faith.</p>
+            <p>Welcome to the Medical Portfolio System for {{practitioner}}.</p>
             <p>This is a health tech communication platform that helps translate complex medical concepts into clear, effective content.</p>
             
             <div class="links">
-                <a href="/admin-portal">Go to Admin Portal</a>
-                <a href="/api/health">Check API Health</a>
-                <a href="/test-form">Test Contact Form</a>
+                <a href="{{base}}/admin-portal">Go to Admin Portal</a>
+                <a href="{{base}}/api/health">Check API Health</a>
+                <a href="{{base}}/test-form">Test Contact Form</a>
             </div>
             
             <h2>System Information:</h2>
             <ul>
-                <li>Database: {db_status}</li>
-                <li>Upload Folder: {upload_status}</li>
+                <li>Database: {{db_status}}</li>
+                <li>Upload Folder: {{upload_status}}</li>
+                <li>Messages Received: {{clients}}</li>
                 <li>PythonAnywhere: Active</li>
             </ul>
         </div>
@@ -159,11 +248,20 @@ def index():
     </html>
     '''
     
-    # Check if database exists
-    db_status = "✅ Ready" if os.path.exists(app.config['DATABASE_PATH']) else "⚠️ Not found"
-    upload_status = "✅ Ready" if os.path.exists(app.config['UPLOAD_FOLDER']) else "⚠️ Not found"
+    tenant = current_tenant()
+    state = tenant_state()
+    
+    def render():
+        # Check if database exists
+        db_status = "✅ Ready" if os.path.exists(tenant.db_path) else "⚠️ Not found"
+        upload_status = "✅ Ready" if os.path.exists(app.config['UPLOAD_FOLDER']) else "⚠️ Not found"
+        return fill(html, practitioner=tenant.practitioner, base=request.script_root,
+                    db_status=db_status, upload_status=upload_status,
+                    clients=count_clients(state))
     
-    return html.format(db_status=db_status, upload_status=upload_status)
+    # Cached per base URL, as a tenant can be reached by host or by path prefix
+    return state.cache.get_or_set('content', 'index' + request.script_root, render,
+                                  ttl=app.config['TENANT_STATS_TTL'])
 
 @app.route('/admin-portal')
 def admin_portal():
@@ -235,16 +333,16 @@ def admin_portal():
             <form id="loginForm">
                 <div class="form-group">
                     <label>Username:</label>
-                    <input type="text" id="username" value="admin" required>
+                    <input type="text" id="username" required>
                 </div>
                 <div class="form-group">
                     <label>Password:</label>
-                    <input type="password" id="password" value="admin9048" required>
+                    <input type="password" id="password" required>
                 </div>
                 <button type="button" onclick="login()">Login</button>
             </form>
             <div class="back-link">
-                <a href="/">← Back to Main Site</a>
+                <a href="{{base}}/">← Back to Main Site</a>
             </div>
         </div>
         
@@ -254,7 +352,7 @@ def admin_portal():
                 const password = document.getElementById('password').value;
                 
                 try {
-                    const response = await fetch('/api/admin/login', {
+                    const response = await fetch('{{base}}/api/admin/login', {
                         method: 'POST',
                         headers: {'Content-Type': 'application/json'},
                         body: JSON.stringify({username, password})
@@ -275,7 +373,8 @@ def admin_portal():
     </body>
     </html>
     '''
-    return html
+    return tenant_state().cache.get_or_set(
+        'templates', 'admin_portal' + request.script_root, lambda: fill(html, base=request.script_root))
 
 @app.route('/api/health')
 def health_check():
@@ -284,7 +383,8 @@ def health_check():
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
         'service': 'Medical Portfolio API',
-        'database': os.path.exists(app.config['DATABASE_PATH']),
+        'tenant': current_tenant().slug,
+        'database': os.path.exists(current_tenant().db_path),
         'python_version': sys.version,
         'platform': sys.platform
     })
@@ -296,17 +396,30 @@ def admin_login():
     username = data.get('username', '')
     password = data.get('password', '')
     
-    if username == 'admin' and password == 'admin9048':
-        # Create a simple token
-        token = secrets.token_hex(32)
+    with tenant_state().pool.connection() as conn:
+        admin = conn.execute('SELECT id, username, password_hash FROM admin_users WHERE username = ?',
+                             (username,)).fetchone()
+    
+    if admin and check_password_hash(admin['password_hash'], password):
+        # Token is scoped to the current tenant
+        admin_data = {'id': admin['id'], 'username': admin['username']}
         return jsonify({
-            'access_token': token,
-            'admin': {'username': 'admin'},
+            'access_token': auth.create_token(admin_data),
+            'admin': admin_data,
             'message': 'Login successful'
         })
     
     return jsonify({'error': 'Invalid credentials'}), 401
 
+@app.route('/api/admin/stats')
+@auth.login_required
+def admin_stats():
+    """Submission stats for the current tenant"""
+    return jsonify({
+        'tenant': current_tenant().to_dict(),
+        'clients': count_clients(tenant_state(), cached=False)
+    })
+
 @app.route('/test-form')
 def test_form():
     """Test contact form"""
@@ -342,7 +455,7 @@ def test_form():
                 };
                 
                 try {
-                    const response = await fetch('/api/clients', {
+                    const response = await fetch('{{base}}/api/clients', {
                         method: 'POST',
                         headers: {'Content-Type': 'application/json'},
                         body: JSON.stringify(data)
@@ -362,7 +475,8 @@ def test_form():
     </body>
     </html>
     '''
-    return html
+    return tenant_state().cache.get_or_set(
+        'templates', 'test_form' + request.script_root, lambda: fill(html, base=request.script_root))
 
 @app.route('/api/clients', methods=['POST'])
 def create_client():
@@ -376,17 +490,16 @@ def create_client():
     if not data.get('name') or not data.get('email') or not data.get('message'):
         return jsonify({'error': 'Name, email, and message are required'}), 400
     
-    # Save to database
-    conn = sqlite3.connect(app.config['DATABASE_PATH'])
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO clients (name, email, message)
-        VALUES (?, ?, ?)
-    ''', (data['name'], data['email'], data['message']))
+    # Save to the tenant's database
+    state = tenant_state()
+    with state.pool.connection() as conn:
+        conn.execute('''
+            INSERT INTO clients (name, email, message)
+            VALUES (?, ?, ?)
+        ''', (data['name'], data['email'], data['message']))
     
-    conn.commit()
-    conn.close()
+    state.cache.invalidate('stats', 'clients')
+    state.cache.invalidate('content')
     
     return jsonify({
         'message': 'Thank you for your message! We will contact you soon.',
@@ -407,6 +520,7 @@ init_db()
 if __name__ == '__main__':
     print("Starting Medical Portfolio System...")
     print(f"Database: {app.config['DATABASE_PATH']}")
+    print(f"Tenants: {len(tenant_registry)} (databases in {app.config['TENANTS_DIR']})")
     print(f"Upload folder: {app.config['UPLOAD_FOLDER']}")
     print(f"Visit: http://localhost:5000")
     app.run(debug=True)
\ No newline at end of file
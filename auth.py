@@ -2,32 +2,44 @@ import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 from flask import request, jsonify
-from typing import Tuple, Optional, Dict
+from typing import Callable, Tuple, Optional, Dict
 
 class AuthManager:
-    """JWT authentication manager"""
+    """JWT authentication manager
+
+    Tokens carry the tenant they were issued for; when a tenant getter is
+    given, tokens from other tenants are rejected.
+    """
     
-    def __init__(self, secret_key: str = None):
+    def __init__(self, secret_key: str = None, tenant_getter: Callable[[], Optional[str]] = None):
         self.secret_key = secret_key
         self.algorithm = "HS256"
+        self.tenant_getter = tenant_getter
+    
+    def current_tenant(self) -> Optional[str]:
+        """Slug of the tenant serving the current request, if any"""
+        return self.tenant_getter() if self.tenant_getter else None
     
-    def create_token(self, admin_data: Dict) -> str:
+    def create_token(self, admin_data: Dict, tenant: str = None) -> str:
         """Create JWT token"""
         payload = {
             'admin': admin_data,
+            'tenant': tenant or self.current_tenant(),
             'exp': datetime.utcnow() + timedelta(hours=24)
         }
         return jwt.encode(payload, self.secret_key, algorithm=self.algorithm)
     
-    def verify_token(self, token: str) -> Tuple[bool, Optional[Dict]]:
-        """Verify JWT token"""
+    def verify_token(self, token: str, tenant: str = None) -> Tuple[bool, Optional[Dict]]:
+        """Verify JWT token, optionally for a specific tenant"""
         try:
             payload = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
-            return True, payload.get('admin')
         except jwt.ExpiredSignatureError:
             return False, "Token has expired"
         except jwt.InvalidTokenError:
             return False, "Invalid token"
+        if tenant is not None and payload.get('tenant') != tenant:
+            return False, "Token is not valid for this portfolio"
+        return True, payload.get('admin')
     
     def get_auth_header(self) -> Optional[str]:
         """Get authorization header from request"""
@@ -44,7 +56,7 @@ class AuthManager:
             if not token:
                 return jsonify({'error': 'Authentication required'}), 401
             
-            success, admin_data = self.verify_token(token)
+            success, admin_data = self.verify_token(token, self.current_tenant())
             if not success:
                 return jsonify({'error': admin_data}), 401
             
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Benchmark multi-tenant hosting with many tenants, few active at once.
+
+Drives the real app through app.test_client(), so every request goes through
+TenantMiddleware, the app's schema, auth and caches. Reports separately:
+
+- first open: a brand new tenant database, including admin provisioning
+  (one pbkdf2 hash of the configured password)
+- login: one pbkdf2 check of the admin password per hot tenant
+- hot/cold requests: a small hot set takes most traffic; cold requests go
+  to random provisioned tenants and usually reopen an evicted database
+
+    python bench_tenants.py --tenants 1000 --active 5 --max-open 32
+"""
+
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+ADMIN_PASSWORD = 'bench-password'
+
+
+def open_fds():
+    """Open file descriptors of this process (Linux only)"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return -1
+
+
+def rss_kb():
+    """Resident set size in KB (Linux only)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return -1
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def report(name, values, unit=1e6, suffix='us'):
+    if values:
+        print(f"{name:>10}: p50={percentile(values, 50) * unit:.1f}{suffix} "
+              f"p99={percentile(values, 99) * unit:.1f}{suffix} n={len(values)}")
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    response = fn(*args, **kwargs)
+    elapsed = time.perf_counter() - t0
+    assert response.status_code < 400, (args, response.status_code, response.data[:200])
+    return response, elapsed
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='tenants-bench-')
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'default.db')
+    os.environ['TENANTS_DIR'] = os.path.join(workdir, 'tenants')
+    os.environ['TENANTS_FILE'] = os.path.join(workdir, 'tenants.json')
+    try:
+        import app as app_module
+        from tenants import TenantManager
+        from werkzeug.security import generate_password_hash
+
+        registry = app_module.tenant_registry
+        app_module.tenant_manager = TenantManager(max_open=args.max_open,
+                                                  pool_size=args.pool_size,
+                                                  init_schema=app_module.init_schema)
+        client = app_module.app.test_client()
+
+        # First open of new tenants: schema creation plus admin provisioning
+        first_open = []
+        for i in range(args.first_open_sample):
+            slug = f'new{i:04d}'
+            registry.add(slug, f'Dr. New {i}', admin_password=ADMIN_PASSWORD)
+            first_open.append(timed(client.get, f'/t/{slug}/')[1])
+
+        # Provision the rest by copying one database with the app's schema,
+        # as an existing deployment's tenant databases would already exist
+        password_hash = generate_password_hash(ADMIN_PASSWORD)
+        template = registry.add('template', 'Template', admin_password_hash=password_hash)
+        with app_module.tenant_manager.get(template).pool.connection() as conn:
+            conn.executemany('INSERT INTO clients (name, email, message) VALUES (?, ?, ?)',
+                             [(f'client{i}', f'c{i}@example.com', 'hello') for i in range(20)])
+        app_module.tenant_manager.close_all()
+        slugs = [f'dr{i:04d}' for i in range(args.tenants)]
+        for i, slug in enumerate(slugs):
+            tenant = registry.add(slug, f'Dr. Tenant {i}', admin_password_hash=password_hash)
+            shutil.copyfile(template.db_path, tenant.db_path)
+
+        rng = random.Random(args.seed)
+        hot = rng.sample(slugs, args.active)
+        headers = {}
+        login = []
+        for slug in hot:
+            response, elapsed = timed(client.post, f'/t/{slug}/api/admin/login',
+                                      json={'username': 'admin', 'password': ADMIN_PASSWORD})
+            headers[slug] = {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+            login.append(elapsed)
+
+        fds_before = open_fds()
+        rss_before = rss_kb()
+        if args.trace_memory:
+            tracemalloc.start()
+
+        latencies = {'hot': [], 'cold': []}
+        start = time.perf_counter()
+        for n in range(args.requests):
+            if rng.random() < args.hot_ratio:
+                slug = rng.choice(hot)
+                kind = n % 10
+                if kind < 7:
+                    _, elapsed = timed(client.get, f'/t/{slug}/')
+                elif kind < 9:
+                    _, elapsed = timed(client.get, f'/t/{slug}/api/admin/stats',
+                                       headers=headers[slug])
+                else:
+                    _, elapsed = timed(client.post, f'/t/{slug}/api/clients',
+                                       json={'name': 'n', 'email': 'e@example.com', 'message': 'm'})
+                latencies['hot'].append(elapsed)
+            else:
+                _, elapsed = timed(client.get, f'/t/{rng.choice(slugs)}/')
+                latencies['cold'].append(elapsed)
+        elapsed = time.perf_counter() - start
+
+        if args.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        manager = app_module.tenant_manager
+
+        print(f"tenants={args.tenants} active={args.active} max_open={args.max_open} "
+              f"pool_size={args.pool_size} requests={args.requests} hot_ratio={args.hot_ratio}")
+        report('first open', first_open, 1e3, 'ms')
+        report('login', login, 1e3, 'ms')
+        print(f"throughput: {args.requests / elapsed:,.0f} req/s")
+        report('hot', latencies['hot'])
+        report('cold', latencies['cold'])
+        if args.trace_memory:
+            print(f"python heap: current={current / 1024:.0f}KB peak={peak / 1024:.0f}KB")
+        print(f"rss: {rss_before}KB -> {rss_kb()}KB")
+        print(f"open fds: {fds_before} -> {open_fds()}")
+        print(f"manager: {manager.stats()}")
+        manager.close_all()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tenants', type=int, default=1000)
+    parser.add_argument('--active', type=int, default=5, help='size of the hot tenant set')
+    parser.add_argument('--max-open', type=int, default=32)
+    parser.add_argument('--pool-size', type=int, default=2)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--hot-ratio', type=float, default=0.95)
+    parser.add_argument('--first-open-sample', type=int, default=10,
+                        help='new tenants created from scratch to time the first open')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='report Python heap via tracemalloc (slows requests down)')
+    run(parser.parse_args(argv))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,7 +3,20 @@ import secrets
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or secrets.token_hex(32)
-    DATABASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medical_portfolio.db')
+    ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD')  # default tenant's admin
+    DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'medical_portfolio.db')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
     UPLOAD_FOLDER = 'static/uploads'
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
\ No newline at end of file
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+    # Multi-tenant hosting: one SQLite database per practitioner portfolio
+    TENANTS_DIR = os.environ.get('TENANTS_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenants')
+    TENANTS_FILE = os.environ.get('TENANTS_FILE') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tenants.json')
+    DEFAULT_TENANT = 'default'
+    TENANT_PATH_PREFIX = '/t'
+    # Once other tenants exist, only these hosts serve the default tenant
+    DEFAULT_TENANT_HOSTS = (os.environ.get('DEFAULT_TENANT_HOSTS') or 'localhost,127.0.0.1').split(',')
+    TENANT_BASE_DOMAIN = os.environ.get('TENANT_BASE_DOMAIN')  # serves <slug>.<domain>
+    TENANT_MAX_OPEN = 32  # tenant databases kept open at once (LRU)
+    TENANT_POOL_SIZE = 2  # idle connections kept per open tenant
+    TENANT_STATS_TTL = 30  # seconds; other workers' submissions show up after this
@@ -0,0 +1,349 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+TENANT_ENVIRON_KEY = 'portfolio.tenant'
+# Slugs name database files, URL path segments and DNS labels
+SLUG_PATTERN = re.compile(r'[a-z0-9][a-z0-9-]{0,62}')
+
+
+@dataclass
+class Tenant:
+    """A practitioner portfolio hosted by this deployment"""
+    slug: str = ""
+    practitioner: str = ""
+    db_path: str = ""
+    hosts: List[str] = field(default_factory=list)
+    admin_username: str = "admin"
+    admin_password: str = field(default="", repr=False)
+    admin_password_hash: str = field(default="", repr=False)
+
+    def to_dict(self):
+        return {
+            'slug': self.slug,
+            'practitioner': self.practitioner,
+            'hosts': list(self.hosts)
+        }
+
+
+class TenantRegistry:
+    """Known tenants, looked up by slug or host name"""
+
+    def __init__(self, tenants_dir: str, base_domain: str = None):
+        self.tenants_dir = tenants_dir
+        self.base_domain = base_domain.lower().strip('.') if base_domain else None
+        self._by_slug: Dict[str, Tenant] = {}
+        self._by_host: Dict[str, str] = {}
+
+    def add(self, slug: str, practitioner: str, db_path: str = None,
+            hosts: List[str] = (), admin_username: str = None,
+            admin_password: str = None, admin_password_hash: str = None) -> Tenant:
+        """Register a tenant; its database lives in the tenants dir by default.
+
+        The admin account is created when the tenant's database is first
+        opened. Without a password or hash nobody can log in to the tenant.
+        """
+        slug = slug.lower()
+        if not SLUG_PATTERN.fullmatch(slug):
+            raise ValueError(f"Invalid tenant slug {slug!r}: use letters, digits and hyphens, "
+                             f"starting with a letter or digit, at most 63 characters")
+        tenant = Tenant(
+            slug=slug,
+            practitioner=practitioner,
+            db_path=db_path or os.path.join(self.tenants_dir, f'{slug}.db'),
+            hosts=[h.lower() for h in hosts],
+            admin_username=admin_username or 'admin',
+            admin_password=admin_password or '',
+            admin_password_hash=admin_password_hash or ''
+        )
+        self._by_slug[slug] = tenant
+        for host in tenant.hosts:
+            self._by_host[host] = slug
+        return tenant
+
+    def load(self, path: str):
+        """Load tenants from a JSON file.
+
+        {"slug": {"practitioner": ..., "hosts": [...], "admin_password_hash": ...}}
+
+        admin_password_hash (werkzeug generate_password_hash output) is the
+        supported way to set a tenant's admin password. A plain-text
+        "admin_password" is accepted for local development only. The file
+        holds credentials either way and must not be committed.
+
+        Entries for an already registered slug (e.g. the default tenant)
+        are merged into it.
+        """
+        if not os.path.exists(path):
+            return
+        with open(path) as f:
+            data = json.load(f)
+        for slug, info in data.items():
+            existing = self.get(slug) or Tenant()
+            self.add(slug, info.get('practitioner') or existing.practitioner or slug,
+                     db_path=info.get('db_path') or existing.db_path or None,
+                     hosts=list(existing.hosts) + list(info.get('hosts', ())),
+                     admin_username=info.get('admin_username') or existing.admin_username,
+                     admin_password=info.get('admin_password') or existing.admin_password,
+                     admin_password_hash=info.get('admin_password_hash') or existing.admin_password_hash)
+
+    def get(self, slug: str) -> Optional[Tenant]:
+        return self._by_slug.get(slug.lower())
+
+    def get_by_host(self, host: str) -> Optional[Tenant]:
+        """Match an exact host first, then '<slug>.<base_domain>' if one is set"""
+        host = host.split(':', 1)[0].lower().rstrip('.')
+        slug = self._by_host.get(host)
+        if slug is None and self.base_domain:
+            label, _, domain = host.partition('.')
+            if domain == self.base_domain:
+                slug = label
+        return self._by_slug.get(slug) if slug else None
+
+    def __len__(self):
+        return len(self._by_slug)
+
+
+class TenantMiddleware:
+    """WSGI middleware that resolves the tenant for each request.
+
+    A leading '/t/<slug>' path prefix wins over the Host header and is moved
+    into SCRIPT_NAME, so the app's routes and url_for() work unchanged.
+    Unknown path prefixes and unknown hosts are a 404. Only a deployment
+    with no other tenants falls back to the default tenant for any host.
+    """
+
+    def __init__(self, wsgi_app, registry: TenantRegistry,
+                 default_slug: str = None, path_prefix: str = '/t'):
+        self.wsgi_app = wsgi_app
+        self.registry = registry
+        self.default_slug = default_slug
+        self.path_prefix = path_prefix.rstrip('/')
+
+    def resolve(self, environ) -> Tuple[Optional[Tenant], str, str]:
+        """Return (tenant, script_name, path_info) for a WSGI environ"""
+        script_name = environ.get('SCRIPT_NAME', '')
+        path = environ.get('PATH_INFO', '')
+
+        if self.path_prefix and path.startswith(self.path_prefix + '/'):
+            rest = path[len(self.path_prefix) + 1:]
+            slug, _, tail = rest.partition('/')
+            tenant = self.registry.get(slug) if slug else None
+            if tenant is None:
+                return None, script_name, path
+            prefix = f'{self.path_prefix}/{tenant.slug}'
+            return tenant, script_name + prefix, '/' + tail
+
+        host = environ.get('HTTP_HOST') or environ.get('SERVER_NAME', '')
+        tenant = self.registry.get_by_host(host) if host else None
+        if tenant is None and self.default_slug and len(self.registry) == 1:
+            tenant = self.registry.get(self.default_slug)
+        return tenant, script_name, path
+
+    def __call__(self, environ, start_response):
+        tenant, script_name, path = self.resolve(environ)
+        if tenant is None:
+            body = b'{"error": "Unknown portfolio"}'
+            start_response('404 NOT FOUND', [
+                ('Content-Type', 'application/json'),
+                ('Content-Length', str(len(body)))
+            ])
+            return [body]
+        environ[TENANT_ENVIRON_KEY] = tenant
+        environ['SCRIPT_NAME'] = script_name
+        environ['PATH_INFO'] = path
+        return self.wsgi_app(environ, start_response)
+
+
+class ConnectionPool:
+    """Small pool of SQLite connections to one tenant database"""
+
+    def __init__(self, db_path: str, size: int = 2):
+        self.db_path = db_path
+        self.size = size
+        self._idle: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def acquire(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        with self._lock:
+            if not self._closed and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, committing on success and rolling back on error"""
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when released"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+
+class TenantCache:
+    """Per-tenant key/value caches split into named namespaces.
+
+    Entries can expire after `ttl` seconds, for values that other worker
+    processes may change behind this one's back.
+    """
+
+    NAMESPACES = ('templates', 'content', 'stats')
+
+    def __init__(self):
+        self._data: Dict[str, Dict] = {name: {} for name in self.NAMESPACES}
+
+    def get_or_set(self, namespace: str, key: str, factory: Callable, ttl: float = None):
+        store = self._data[namespace]
+        entry = store.get(key)
+        now = time.monotonic()
+        if entry is None or (entry[1] is not None and entry[1] <= now):
+            entry = (factory(), now + ttl if ttl is not None else None)
+            store[key] = entry
+        return entry[0]
+
+    def invalidate(self, namespace: str, key: str = None):
+        if key is None:
+            self._data[namespace].clear()
+        else:
+            self._data[namespace].pop(key, None)
+
+
+class TenantState:
+    """Open resources for one active tenant: its pool and its caches"""
+
+    def __init__(self, tenant: Tenant, pool: ConnectionPool):
+        self.tenant = tenant
+        self.pool = pool
+        self.cache = TenantCache()
+
+    def close(self):
+        self.pool.close()
+
+
+class TenantManager:
+    """LRU of open tenant states so only recently used tenants hold files.
+
+    Databases are opened lazily on first use; once more than `max_open`
+    tenants are open the least recently used one is closed, which bounds
+    idle file handles to max_open * pool_size. Each slug is opened by a
+    single thread even when its first requests arrive concurrently.
+    """
+
+    def __init__(self, max_open: int = 32, pool_size: int = 2,
+                 init_schema: Callable[[sqlite3.Connection, Tenant], None] = None):
+        self.max_open = max_open
+        self.pool_size = pool_size
+        self.init_schema = init_schema
+        self._open: 'OrderedDict[str, TenantState]' = OrderedDict()
+        self._opening: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, tenant: Tenant) -> TenantState:
+        """Return the tenant's open state, opening its database if needed"""
+        with self._lock:
+            state = self._lookup(tenant.slug)
+            if state is not None:
+                return state
+            opening = self._opening.setdefault(tenant.slug, threading.Lock())
+
+        # One thread per slug opens the database; the rest wait for it here
+        with opening:
+            with self._lock:
+                state = self._lookup(tenant.slug)
+            if state is not None:
+                return state
+
+            try:
+                state = self._open_tenant(tenant)
+            except Exception:
+                with self._lock:
+                    self._opening.pop(tenant.slug, None)
+                raise
+
+            evicted = []
+            with self._lock:
+                # Publish before dropping the slug lock so no new opener starts
+                self._opening.pop(tenant.slug, None)
+                self.misses += 1
+                self._open[tenant.slug] = state
+                while len(self._open) > self.max_open:
+                    _, old = self._open.popitem(last=False)
+                    evicted.append(old)
+                    self.evictions += 1
+        for old in evicted:
+            old.close()
+        return state
+
+    def _lookup(self, slug: str) -> Optional[TenantState]:
+        """Open state for a slug, marked as most recently used; needs _lock"""
+        state = self._open.get(slug)
+        if state is not None:
+            self._open.move_to_end(slug)
+            self.hits += 1
+        return state
+
+    def _open_tenant(self, tenant: Tenant) -> TenantState:
+        db_dir = os.path.dirname(tenant.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        pool = ConnectionPool(tenant.db_path, self.pool_size)
+        if self.init_schema:
+            try:
+                with pool.connection() as conn:
+                    self.init_schema(conn, tenant)
+            except Exception:
+                pool.close()
+                raise
+        return TenantState(tenant, pool)
+
+    def close_all(self):
+        with self._lock:
+            states = list(self._open.values())
+            self._open.clear()
+        for state in states:
+            state.close()
+
+    def stats(self) -> Dict:
+        return {
+            'open': len(self._open),
+            'max_open': self.max_open,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,57 @@
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py opens its databases at import time; keep them out of the repo
+_workdir = tempfile.mkdtemp(prefix='portfolio-tests-')
+os.environ['DATABASE_PATH'] = os.path.join(_workdir, 'default.db')
+os.environ['TENANTS_DIR'] = os.path.join(_workdir, 'tenants')
+os.environ['TENANTS_FILE'] = os.path.join(_workdir, 'tenants.json')
+os.environ.pop('ADMIN_PASSWORD', None)
+os.environ['SECRET_KEY'] = 'test-secret-key'
+
+import app as app_module  # noqa: E402
+from tenants import TenantRegistry, TenantManager  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+ADMIN_PASSWORD = 'correct horse'
+# A cheap hash keeps provisioning fast; login checks use whatever method it names
+ADMIN_PASSWORD_HASH = generate_password_hash(ADMIN_PASSWORD, method='pbkdf2:sha256:1000')
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_workdir, ignore_errors=True)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = TenantRegistry(str(tmp_path / 'tenants'), base_domain='portfolios.test')
+    registry.add('default', 'Dr. Foscah Faith', db_path=str(tmp_path / 'default.db'),
+                 hosts=['localhost'])
+    registry.add('drsmith', 'Dr. Smith', hosts=['drsmith.com'],
+                 admin_password_hash=ADMIN_PASSWORD_HASH)
+    registry.add('drjones', 'Dr. Jones', admin_password_hash=ADMIN_PASSWORD_HASH)
+    return registry
+
+
+@pytest.fixture
+def manager():
+    manager = TenantManager(max_open=2, pool_size=1, init_schema=app_module.init_schema)
+    yield manager
+    manager.close_all()
+
+
+@pytest.fixture
+def client(registry, manager, monkeypatch):
+    """Test client for the app, wired to a fresh registry and tenant manager"""
+    monkeypatch.setattr(app_module, 'tenant_registry', registry)
+    monkeypatch.setattr(app_module, 'tenant_manager', manager)
+    monkeypatch.setattr(app_module.app.wsgi_app, 'registry', registry)
+    return app_module.app.test_client()
+
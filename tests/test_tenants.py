@@ -0,0 +1,244 @@
+import sqlite3
+import threading
+
+import pytest
+
+import app as app_module
+from auth import AuthManager
+from conftest import ADMIN_PASSWORD, ADMIN_PASSWORD_HASH
+from tenants import TenantCache, TenantManager, TenantMiddleware, TenantRegistry
+from werkzeug.security import generate_password_hash
+
+
+def login(client, prefix, password=ADMIN_PASSWORD, username='admin'):
+    return client.post(f'{prefix}/api/admin/login',
+                       json={'username': username, 'password': password})
+
+
+def tenant_of(response):
+    return response.get_json()['tenant']
+
+
+def create_legacy_database(path):
+    """Database as the single-practitioner version created it, with admin/admin9048"""
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE admin_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL
+        )
+    ''')
+    conn.execute('INSERT INTO admin_users (username, password_hash) VALUES (?, ?)',
+                 ('admin', generate_password_hash('admin9048', method='pbkdf2:sha256:1000')))
+    conn.commit()
+    conn.close()
+
+
+# ==================== RESOLUTION ====================
+def test_resolves_by_path_prefix(client):
+    assert tenant_of(client.get('/t/drsmith/api/health')) == 'drsmith'
+    assert tenant_of(client.get('/t/drjones/api/health')) == 'drjones'
+
+
+def test_path_prefix_is_canonicalised(client):
+    response = client.get('/t/DrSmith/')
+    assert response.status_code == 200
+    assert b'href="/t/drsmith/admin-portal"' in response.data
+
+
+def test_resolves_by_host(client):
+    assert tenant_of(client.get('/api/health', headers={'Host': 'drsmith.com'})) == 'drsmith'
+    assert tenant_of(client.get('/api/health', headers={'Host': 'localhost:5000'})) == 'default'
+
+
+def test_resolves_subdomain_of_base_domain_only(client):
+    response = client.get('/api/health', headers={'Host': 'drjones.portfolios.test'})
+    assert tenant_of(response) == 'drjones'
+    assert client.get('/api/health', headers={'Host': 'drjones.elsewhere.test'}).status_code == 404
+
+
+def test_unknown_slug_is_404(client):
+    response = client.get('/t/nobody/api/health')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'Unknown portfolio'}
+
+
+def test_unknown_host_is_404(client):
+    assert client.get('/api/health', headers={'Host': 'www.drsmith.com'}).status_code == 404
+    response = client.post('/api/clients', headers={'Host': 'www.drsmith.com'},
+                           json={'name': 'a', 'email': 'b@example.com', 'message': 'c'})
+    assert response.status_code == 404
+
+
+def test_single_tenant_deployment_serves_any_host(tmp_path):
+    registry = TenantRegistry(str(tmp_path))
+    registry.add('default', 'Dr. Foscah Faith')
+    middleware = TenantMiddleware(None, registry, default_slug='default')
+    tenant, _, _ = middleware.resolve({'HTTP_HOST': 'anything.example', 'PATH_INFO': '/'})
+    assert tenant.slug == 'default'
+
+
+# ==================== DATABASES AND CACHES ====================
+def test_lru_eviction_closes_pool(client, registry, manager):
+    client.get('/t/drsmith/')
+    smith = manager.get(registry.get('drsmith'))
+    assert smith.pool.idle_count == 1
+
+    client.get('/t/drjones/')
+    client.get('/')
+    assert manager.stats()['evictions'] == 1
+    assert smith.pool.idle_count == 0
+    assert manager.get(registry.get('drsmith')) is not smith
+
+
+def test_submission_invalidates_only_that_tenants_cache(client):
+    assert b'Messages Received: 0' in client.get('/t/drsmith/').data
+    assert b'Messages Received: 0' in client.get('/t/drjones/').data
+
+    response = client.post('/t/drsmith/api/clients',
+                           json={'name': 'a', 'email': 'b@example.com', 'message': 'c'})
+    assert response.status_code == 201
+
+    assert b'Messages Received: 1' in client.get('/t/drsmith/').data
+    assert b'Messages Received: 0' in client.get('/t/drjones/').data
+
+
+def test_cache_entries_expire_after_ttl():
+    cache = TenantCache()
+    values = iter([1, 2])
+    assert cache.get_or_set('stats', 'clients', lambda: next(values), ttl=0) == 1
+    assert cache.get_or_set('stats', 'clients', lambda: next(values), ttl=0) == 2
+
+
+def test_concurrent_first_open_initialises_once(client, registry, manager):
+    barrier = threading.Barrier(8)
+    codes = []
+
+    def hit():
+        local = client.application.test_client()
+        barrier.wait()
+        for _ in range(10):
+            codes.append(local.get('/t/drsmith/test-form').status_code)
+
+    threads = [threading.Thread(target=hit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert codes == [200] * 80
+    assert manager.stats()['misses'] == 1
+
+
+def test_manager_runs_init_schema_once_per_slug(registry):
+    calls = []
+    started = threading.Event()
+
+    def slow_init(conn, tenant):
+        calls.append(tenant.slug)
+        started.wait(0.2)
+
+    manager = TenantManager(max_open=4, init_schema=slow_init)
+    tenant = registry.get('drsmith')
+    states = []
+    threads = [threading.Thread(target=lambda: states.append(manager.get(tenant)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.set()
+    for thread in threads:
+        thread.join()
+    manager.close_all()
+
+    assert calls == ['drsmith']
+    assert len({id(state) for state in states}) == 1
+
+
+# ==================== AUTH ====================
+def test_token_is_rejected_by_other_tenant(client):
+    response = login(client, '/t/drsmith')
+    assert response.status_code == 200
+    headers = {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+
+    assert client.get('/t/drsmith/api/admin/stats', headers=headers).status_code == 200
+    response = client.get('/t/drjones/api/admin/stats', headers=headers)
+    assert response.status_code == 401
+    assert response.get_json()['error'] == 'Token is not valid for this portfolio'
+
+
+def test_token_verifies_in_another_worker(client):
+    assert app_module.app.config['SECRET_KEY'] == 'test-secret-key'
+    token = login(client, '/t/drsmith').get_json()['access_token']
+    # A second worker builds its own AuthManager from the same SECRET_KEY env var
+    other_worker = AuthManager('test-secret-key')
+    assert other_worker.verify_token(token, 'drsmith')[0]
+
+
+def test_no_shared_default_admin(client):
+    assert login(client, '/t/drjones', password='admin9048').status_code == 401
+    assert login(client, '', password='admin9048').status_code == 401
+    assert login(client, '', password=ADMIN_PASSWORD).status_code == 401
+
+
+def test_configured_password_replaces_legacy_admin(client, registry):
+    default = registry.get('default')
+    create_legacy_database(default.db_path)
+    registry.add('default', default.practitioner, db_path=default.db_path,
+                 hosts=default.hosts, admin_password='new-strong-pw')
+
+    assert login(client, '', password='admin9048').status_code == 401
+    assert login(client, '', password='new-strong-pw').status_code == 200
+
+
+def test_unconfigured_legacy_admin_is_removed(client, registry):
+    create_legacy_database(registry.get('default').db_path)
+
+    assert login(client, '', password='admin9048').status_code == 401
+
+
+def test_changed_password_hash_is_applied_on_reopen(client, registry, manager):
+    assert login(client, '/t/drsmith').status_code == 200
+
+    registry.get('drsmith').admin_password_hash = generate_password_hash(
+        'rotated', method='pbkdf2:sha256:1000')
+    manager.close_all()
+
+    assert login(client, '/t/drsmith').status_code == 401
+    assert login(client, '/t/drsmith', password='rotated').status_code == 200
+
+
+def test_admin_portal_has_no_prefilled_credentials(client):
+    response = client.get('/t/drsmith/admin-portal')
+    assert b'admin9048' not in response.data
+    assert b'value="admin"' not in response.data
+
+
+@pytest.mark.parametrize('slug', ['../x', 'a/b', '', '-dr', 'dr.smith', 'dr\n', 'x' * 64])
+def test_invalid_slug_is_rejected(tmp_path, slug):
+    registry = TenantRegistry(str(tmp_path))
+    with pytest.raises(ValueError):
+        registry.add(slug, 'Dr. Nobody')
+
+
+def test_tenants_file_with_invalid_slug_is_rejected(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text('{"../outside": {"practitioner": "Dr. Nobody"}}')
+    with pytest.raises(ValueError):
+        TenantRegistry(str(tmp_path / 'tenants')).load(str(path))
+    assert not (tmp_path / 'outside.db').exists()
+
+
+def test_tenants_file_merges_into_default(tmp_path):
+    path = tmp_path / 'tenants.json'
+    path.write_text('{"default": {"hosts": ["example.org"], "admin_password_hash": "%s"}}'
+                    % ADMIN_PASSWORD_HASH)
+    registry = TenantRegistry(str(tmp_path))
+    registry.add('default', 'Dr. Foscah Faith', db_path='default.db', hosts=['localhost'])
+    registry.load(str(path))
+
+    tenant = registry.get('default')
+    assert tenant.practitioner == 'Dr. Foscah Faith'
+    assert tenant.db_path == 'default.db'
+    assert tenant.hosts == ['localhost', 'example.org']
+    assert tenant.admin_password_hash == ADMIN_PASSWORD_HASH